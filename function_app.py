@@ -4,11 +4,11 @@ Remplace la fonction durable par des fonctions HTTP simples
 """
 
 import azure.functions as func
-import json
+import functools
 import logging
 import os
 from typing import Dict, Any
-from datetime import datetime, timezone
+import orjson
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -18,58 +18,132 @@ logger = logging.getLogger(__name__)
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
 
 # Import des handlers après l'initialisation de l'app
-from shared.services.translation_handler import TranslationHandler
-from shared.services.status_handler import StatusHandler
-from shared.utils.response_helper import create_response, create_error_response
-from shared.services.blob_service import BlobService
-from shared.services.translation_service import TranslationService
-from shared.services.graph_service import GraphService
+from shared.utils.response_helper import (
+    create_response,
+    create_error_response,
+    create_prebuilt_response,
+    create_cached_error_response,
+    JSON_DUMPS_OPTIONS
+)
 from shared.config import Config
 
 onedrive_upload_enabled = Config.ONEDRIVE_UPLOAD_ENABLED
 
-# Initialisation des handlers
-translation_handler = TranslationHandler()
-status_handler = StatusHandler()
-blob_service = BlobService()
-graph_service = GraphService()
-translation_service = TranslationService()
+
+# Initialisation paresseuse des services : les SDK Azure (Storage, Translator, Graph)
+# ne sont importés qu'à la première route qui en a besoin, pas au démarrage à froid
+@functools.lru_cache(maxsize=1)
+def _status_handler():
+    from shared.services.status_handler import StatusHandler
+    return StatusHandler()
+
+
+@functools.lru_cache(maxsize=1)
+def _blob_service():
+    from shared.services.blob_service import BlobService
+    return BlobService()
+
+
+@functools.lru_cache(maxsize=1)
+def _translation_service():
+    from shared.services.translation_service import TranslationService
+    return TranslationService()
+
+
+# Health check : l'environnement d'une instance ne change pas à chaud,
+# les variables critiques ne sont donc vérifiées qu'une fois au chargement
+_HEALTH_REQUIRED_VARS = (
+    'TRANSLATOR_KEY',
+    'TRANSLATOR_ENDPOINT',
+    'AZURE_ACCOUNT_NAME',
+    'AZURE_ACCOUNT_KEY'
+)
+_HEALTH_MISSING_VARS = tuple(var for var in _HEALTH_REQUIRED_VARS if not os.getenv(var))
+_HEALTH_MISSING_VARS_MESSAGE = f"Variables d'environnement manquantes: {', '.join(_HEALTH_MISSING_VARS)}"
+_HEALTH_PAYLOAD = orjson.dumps({
+    "status": "healthy",
+    "services": {
+        "translator": "available",
+        "blob_storage": "available",
+        "onedrive": "available" if onedrive_upload_enabled else "not configured"
+    }
+}, option=JSON_DUMPS_OPTIONS)
+
+
+# Payloads constants (langues, formats) : sérialisés une seule fois par instance
+@functools.lru_cache(maxsize=1)
+def _languages_payload() -> bytes:
+    from shared.models.schemas import SupportedLanguages
+    languages = SupportedLanguages.get_all_languages()
+    return orjson.dumps({
+        "languages": languages,
+        "count": len(languages)
+    }, option=JSON_DUMPS_OPTIONS)
+
+
+@functools.lru_cache(maxsize=1)
+def _formats_payload() -> bytes:
+    from shared.models.schemas import FileFormats
+    formats = FileFormats.get_all_formats()
+    return orjson.dumps({
+        "formats": formats,
+        "count": len(formats)
+    }, option=JSON_DUMPS_OPTIONS)
+
+
+def _internal_error_response(message: str, error: Exception, status_code: int = 500) -> func.HttpResponse:
+    """
+    Réponse d'erreur interne : le détail de l'exception n'est exposé au client
+    que si EXPOSE_ERROR_DETAILS est activé, sinon le corps constant est réutilisé
+    """
+    if Config.EXPOSE_ERROR_DETAILS:
+        return create_error_response(f"{message}: {error}", status_code)
+    return create_cached_error_response(message, status_code)
+
+
+def _validation_error_message(error) -> str:
+    """Message client pour la première erreur d'une ValidationError pydantic"""
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first.get("loc", ()))
+    if first.get("type") == "json_invalid":
+        return f"JSON invalide: {first.get('msg')}"
+    if first.get("type") == "missing":
+        return f"Paramètre manquant: {field}"
+    return f"Paramètre invalide: {field or 'corps'} ({first.get('msg')})"
+
 
 @app.route(route="start_translation", methods=["POST"])
 def start_translation(req: func.HttpRequest) -> func.HttpResponse:
     logger.info("🚀 Démarrage d'une nouvelle traduction")
 
     try:
-        if not req.get_body():
+        body = req.get_body()
+        if not body:
             return create_error_response("Corps de requête manquant", 400)
 
+        # Parsing + validation en une seule passe (pydantic-core) sur le corps brut
+        from pydantic import ValidationError
+        from shared.models.schemas import StartTranslationRequest
         try:
-            data = req.get_json()
-        except ValueError as e:
-            return create_error_response(f"JSON invalide: {str(e)}", 400)
-
-        required_fields = ["blob_name", "target_language", "user_id"]
-        for field in required_fields:
-            if field not in data:
-                return create_error_response(f"Paramètre manquant: {field}", 400)
-
-        blob_name = data["blob_name"]
-        target_language = data["target_language"]
-        user_id = data["user_id"]
-
-        # 1. Vérifier l’existence du blob
-        blob_service = BlobService()
-        if not blob_service.check_blob_exists(blob_name):
-            return create_error_response(f"Fichier '{blob_name}' non trouvé", 404)
+            data = StartTranslationRequest.model_validate_json(body)
+        except ValidationError as e:
+            return create_error_response(_validation_error_message(e), 400)
+
+        blob_name = data.blob_name
+        target_language = data.target_language
+        user_id = data.user_id
 
-        # 2. Construire les URLs SAS
-        blob_urls = blob_service.prepare_translation_urls(blob_name, target_language)
+        # 1-2. Vérifier l’existence du blob et construire les URLs SAS
+        from shared.services.blob_service import BlobNotFoundError
+        try:
+            blob_urls = _blob_service().prepare_or_404(blob_name, target_language)
+        except BlobNotFoundError:
+            return create_error_response(f"Fichier '{blob_name}' non trouvé", 404)
         source_url = blob_urls["source_url"]
         target_url = blob_urls["target_url"]
 
         # 3. Démarrer la traduction
-        translation_service = TranslationService()
-        translation_id = translation_service.start_translation(
+        translation_id = _translation_service().start_translation(
             source_url=source_url,
             target_url=target_url,
             target_language=target_language
@@ -86,8 +160,8 @@ def start_translation(req: func.HttpRequest) -> func.HttpResponse:
         return create_response(result, 202)
 
     except Exception as e:
-        logger.error(f"❌ Erreur traduction: {str(e)}")
-        return create_error_response(f"Erreur lors de la traduction: {str(e)}", 500)
+        logger.exception("❌ Erreur traduction")
+        return _internal_error_response("Erreur lors de la traduction", e)
 
 
 @app.route(route="check_status/{translation_id}", methods=["GET"])
@@ -97,14 +171,14 @@ def check_translation_status(req: func.HttpRequest) -> func.HttpResponse:
         return create_error_response("ID de traduction manquant", 400)
     logger.info(f"🔍 Vérification du statut pour: {translation_id}")
     try:
-        result = status_handler.check_status(translation_id)
+        result = _status_handler().check_status(translation_id)
         if result['success']:
             return create_response(result['data'], 200)
         else:
             return create_error_response(result['message'], 404)
     except Exception as e:
-        logger.error(f"❌ Erreur inattendue: {str(e)}")
-        return create_error_response(f"Erreur interne: {str(e)}", 500)
+        logger.exception("❌ Erreur inattendue")
+        return _internal_error_response("Erreur interne", e)
 
 
 @app.route(route="get_result", methods=["GET"])
@@ -126,6 +200,7 @@ def get_translation_result(req: func.HttpRequest) -> func.HttpResponse:
         output_blob_name = f"{file_base}-{target_language}.{file_ext}"
 
         # Génère l'URL SAS
+        blob_service = _blob_service()
         download_url = blob_service.get_translated_file_url(output_blob_name)
         if not download_url:
             return create_error_response("Fichier traduit introuvable", 404)
@@ -136,15 +211,23 @@ def get_translation_result(req: func.HttpRequest) -> func.HttpResponse:
 
         # (Optionnel) Upload vers OneDrive
         if user_id:
-            file_content = blob_service.download_translated_file(output_blob_name)
-            onedrive_url = graph_service.upload_to_onedrive(file_content, output_blob_name, user_id)
-            result["onedrive_url"] = onedrive_url
+            # Flux blob -> OneDrive : le fichier n'est jamais entièrement chargé en mémoire
+            blob_stream = blob_service.stream_translated_file(output_blob_name)
+            if blob_stream:
+                chunks, total_size = blob_stream
+                from shared.services.graph_service import get_graph_service, public_upload_result
+                onedrive_url = get_graph_service().upload_stream_to_onedrive(
+                    chunks, total_size, output_blob_name, user_id
+                )
+                result["onedrive_url"] = public_upload_result(onedrive_url)
+            else:
+                result["onedrive_error"] = "Fichier traduit inaccessible"
 
         return create_response(result, 200)
 
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la récupération du résultat: {str(e)}")
-        return create_error_response(f"Erreur interne: {str(e)}", 500)
+        logger.exception("❌ Erreur lors de la récupération du résultat")
+        return _internal_error_response("Erreur interne", e)
 
 
 @app.route(route="health", methods=["GET"])
@@ -153,40 +236,14 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
     Point de santé pour vérifier que les fonctions sont opérationnelles
     """
     try:
-        # Vérification des variables d'environnement critiques
-        required_vars = [
-            'TRANSLATOR_KEY',
-            'TRANSLATOR_ENDPOINT',
-            'AZURE_ACCOUNT_NAME',
-            'AZURE_ACCOUNT_KEY'
-        ]
-        
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
-        
-        if missing_vars:
-            return create_error_response(
-                f"Variables d'environnement manquantes: {', '.join(missing_vars)}", 
-                503
-            )
-        if onedrive_upload_enabled:
-            od_available = "available"
-        else:
-            od_available = "not configured"
-        health_data = {
-            "status": "healthy",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "services": {
-                "translator": "available",
-                "blob_storage": "available",
-                "onedrive": od_available
-            }
-        }
-        
-        return create_response(health_data, 200)
-        
+        # Résultat calculé au chargement du module : seule l'enveloppe est construite ici
+        if _HEALTH_MISSING_VARS:
+            return create_cached_error_response(_HEALTH_MISSING_VARS_MESSAGE, 503)
+        return create_prebuilt_response(_HEALTH_PAYLOAD, 200)
+
     except Exception as e:
-        logger.error(f"❌ Erreur du health check: {str(e)}")
-        return create_error_response(f"Service unhealthy: {str(e)}", 503)
+        logger.exception("❌ Erreur du health check")
+        return _internal_error_response("Service unhealthy", e, 503)
 
 
 @app.route(route="languages", methods=["GET"])
@@ -195,18 +252,11 @@ def get_supported_languages(req: func.HttpRequest) -> func.HttpResponse:
     Retourne la liste des langues supportées
     """
     try:
-        from shared.models.schemas import SupportedLanguages
-        
-        languages = SupportedLanguages.get_all_languages()
-        
-        return create_response({
-            "languages": languages,
-            "count": len(languages)
-        }, 200)
+        return create_prebuilt_response(_languages_payload(), 200)
         
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la récupération des langues: {str(e)}")
-        return create_error_response(f"Erreur interne: {str(e)}", 500)
+        logger.exception("❌ Erreur lors de la récupération des langues")
+        return _internal_error_response("Erreur interne", e)
 
 
 @app.route(route="formats", methods=["GET"])
@@ -215,15 +265,8 @@ def get_supported_formats(req: func.HttpRequest) -> func.HttpResponse:
     Retourne la liste des formats de fichiers supportés
     """
     try:
-        from shared.models.schemas import FileFormats
-        
-        formats = FileFormats.get_all_formats()
-        
-        return create_response({
-            "formats": formats,
-            "count": len(formats)
-        }, 200)
+        return create_prebuilt_response(_formats_payload(), 200)
         
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la récupération des formats: {str(e)}")
-        return create_error_response(f"Erreur interne: {str(e)}", 500)
+        logger.exception("❌ Erreur lors de la récupération des formats")
+        return _internal_error_response("Erreur interne", e)
@@ -27,6 +27,8 @@ class Config:
     TENANT_ID = os.getenv('TENANT_ID')
     ONEDRIVE_UPLOAD_ENABLED = os.getenv('ONEDRIVE_UPLOAD_ENABLED', 'false').lower() == 'true'
     ONEDRIVE_FOLDER = os.getenv('ONEDRIVE_FOLDER')
+    # Détail des exceptions dans les réponses d'erreur (développement uniquement)
+    EXPOSE_ERROR_DETAILS = os.getenv('EXPOSE_ERROR_DETAILS', 'false').lower() == 'true'
     # Limites
     CLEANUP_INTERVAL_HOURS = int(os.getenv('CLEANUP_INTERVAL_HOURS', 1))
 
@@ -25,6 +25,13 @@ class TranslationRequest(BaseModel):
     user_id: str = Field(..., description="Identifiant unique de l'utilisateur")
 
 
+class StartTranslationRequest(BaseModel):
+    """Requête de démarrage de traduction d'un blob existant"""
+    blob_name: str = Field(..., description="Nom du blob source dans le conteneur d'entrée")
+    target_language: str = Field(..., description="Code langue cible (ex: 'fr', 'en', 'es')")
+    user_id: str = Field(..., description="Identifiant unique de l'utilisateur")
+
+
 class BlobUrls(BaseModel):
     """URLs des blobs source et cible"""
     source_url: str = Field(..., description="URL SAS du blob source")
@@ -7,12 +7,20 @@ import logging
 import base64
 import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from azure.core.exceptions import ResourceNotFoundError
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 from shared.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Taille des lectures par requête GET : borne la mémoire lors des téléchargements en flux
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class BlobNotFoundError(Exception):
+    """Le blob source demandé n'existe pas"""
+
 
 class BlobService:
     """Service pour la gestion des blobs Azure Storage"""
@@ -41,6 +49,13 @@ class BlobService:
             account_url=Config.get_storage_url(),
             credential=self.account_key
         )
+        # Client dédié aux lectures en flux : GET de DOWNLOAD_CHUNK_SIZE au plus par requête
+        self._stream_blob_service_client = BlobServiceClient(
+            account_url=Config.get_storage_url(),
+            credential=self.account_key,
+            max_single_get_size=DOWNLOAD_CHUNK_SIZE,
+            max_chunk_get_size=DOWNLOAD_CHUNK_SIZE
+        )
 
         logger.info("✅ BlobService initialisé")
 
@@ -158,6 +173,30 @@ class BlobService:
             logger.error(f"❌ Erreur lors du téléchargement: {str(e)}")
             return None
 
+    def stream_translated_file(self, output_blob_name: str) -> Optional[Tuple[Iterator[bytes], int]]:
+        """
+        Ouvre le fichier traduit en flux
+        Retourne (itérateur de chunks, taille totale) sans charger tout le contenu en mémoire
+        """
+        try:
+            blob_client = self._stream_blob_service_client.get_blob_client(
+                container=self.output_container,
+                blob=output_blob_name
+            )
+
+            # download_blob lève ResourceNotFoundError : pas besoin d'un appel exists() préalable
+            downloader = blob_client.download_blob()
+
+            logger.info(f"✅ Fichier ouvert en flux: {downloader.size} bytes")
+            return downloader.chunks(), downloader.size
+
+        except ResourceNotFoundError:
+            logger.warning(f"⚠️ Fichier traduit introuvable: {output_blob_name}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'ouverture du flux: {str(e)}")
+            return None
+
     def cleanup_translation_files(self, input_blob_name: str, output_blob_name: str) -> bool:
         """
         Nettoie les fichiers de traduction après traitement
@@ -244,14 +283,14 @@ class BlobService:
                 container=container_name,
                 blob=blob_name
             )
-            
-            if blob_client.exists():
-                blob_client.delete_blob()
-                logger.info(f"🗑️ Ancien fichier cible supprimé: {blob_name}")
-                return True
-            
+
+            # Suppression directe : un seul aller-retour au lieu de exists() + delete
+            blob_client.delete_blob()
+            logger.info(f"🗑️ Ancien fichier cible supprimé: {blob_name}")
+            return True
+
+        except ResourceNotFoundError:
             return False
-            
         except Exception as e:
             logger.warning(f"⚠️ Erreur lors de la suppression du fichier cible: {str(e)}")
             return False
@@ -295,6 +334,24 @@ class BlobService:
                 f"Erreur lors de la vérification du blob {blob_name}: {str(e)}")
             return False
         
+    def prepare_or_404(self, input_blob_name: str, target_language: str) -> Dict[str, str]:
+        """
+        Vérifie l'existence du blob source et prépare les URLs de traduction
+        Lève BlobNotFoundError si le blob source est introuvable
+        """
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.input_container,
+            blob=input_blob_name
+        )
+
+        try:
+            blob_client.get_blob_properties()
+        except ResourceNotFoundError:
+            logger.warning(f"⚠️ Fichier source introuvable: {input_blob_name}")
+            raise BlobNotFoundError(input_blob_name)
+
+        return self.prepare_translation_urls(input_blob_name, target_language)
+
     def prepare_translation_urls(self, input_blob_name: str, target_language: str) -> Dict[str, str]:
         """
         Prépare les URLs pour la traduction d'un blob existant
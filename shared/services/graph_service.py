@@ -3,14 +3,46 @@ Service Microsoft Graph pour OneDrive
 Adapté du code conteneur existant
 """
 
+import functools
 import logging
+import threading
 import requests
+import orjson
 import base64
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from shared.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Taille du pool de connexions HTTP partagé (≈ concurrence attendue par instance)
+GRAPH_POOL_SIZE = 20
+
+# Réponses JSON de Graph compressées (décompressées de façon transparente par requests)
+GRAPH_ACCEPT_ENCODING = 'gzip, deflate'
+
+# Durée de validité du cache des identifiants de dossiers OneDrive (24h)
+FOLDER_CACHE_TTL_SECONDS = 24 * 3600
+
+# Au-delà de 4 Mo, Graph impose une session d'upload (createUploadSession)
+SIMPLE_UPLOAD_MAX_BYTES = 4 * 1024 * 1024
+# Taille des morceaux envoyés en session : multiple de 320 Kio exigé par Graph (5 Mio)
+UPLOAD_CHUNK_SIZE = 16 * 320 * 1024
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+# Message client en cas d'échec d'upload (le détail Graph/exception reste dans les logs)
+ONEDRIVE_UPLOAD_ERROR = "Échec de l'upload OneDrive"
+
+# Politique de retry sur erreurs transitoires Graph/AAD
+GRAPH_RETRY_TOTAL = 3
+GRAPH_RETRY_BACKOFF = 0.3
+GRAPH_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+GRAPH_RETRY_METHODS = frozenset(["POST", "GET", "PUT", "DELETE"])
+
 
 class GraphService:
     """Service pour l'intégration Microsoft Graph (OneDrive)"""
@@ -29,9 +61,49 @@ class GraphService:
         # Cache du token (en production, utiliser Redis ou équivalent)
         self._access_token = None
         self._token_expires_at = None
+        # Verrou de rafraîchissement : un seul appel AAD quand le token expire sous concurrence
+        self._token_lock = threading.Lock()
+
+        # Cache des identifiants de dossiers : nom -> (id, expiration)
+        # Tous les appels ciblent /me, le drive dépend du token et non du user_id
+        self._folder_id_cache: Dict[str, Tuple[str, float]] = {}
+        # ETag des dossiers en cache : revalidation par GET conditionnel une fois le TTL expiré
+        self._folder_etags: Dict[str, str] = {}
+        # Préfixes d'URL d'upload par identifiant de dossier ("{graph}/me/drive/items/{id}:")
+        self._upload_prefixes: Dict[str, str] = {}
+
+        # Préfixe de date des noms de fichiers (jour UTC, "AAAAMMJJ"), recalculé une fois par jour
+        self._date_prefix: Tuple[int, str] = (-1, "")
+
+        # Session HTTP partagée : réutilise les connexions TCP/TLS entre les appels Graph
+        self._session = self._create_session()
+        # Session sans retry pour les POST non idempotents (un 5xx ayant abouti ne doit pas être rejoué)
+        self._no_retry_session = self._create_session(retry=False)
 
         logger.info("✅ GraphService initialisé")
 
+    @staticmethod
+    def _create_session(retry: bool = True) -> requests.Session:
+        """Crée une session HTTP avec pool de connexions et, par défaut, retry sur erreurs transitoires"""
+        # POST inclus : couvre le endpoint de token AAD et les appels $batch
+        max_retries = Retry(
+            total=GRAPH_RETRY_TOTAL,
+            backoff_factor=GRAPH_RETRY_BACKOFF,
+            status_forcelist=GRAPH_RETRY_STATUSES,
+            allowed_methods=GRAPH_RETRY_METHODS,
+            raise_on_status=False
+        ) if retry else 0
+        adapter = HTTPAdapter(
+            pool_connections=GRAPH_POOL_SIZE,
+            pool_maxsize=GRAPH_POOL_SIZE,
+            max_retries=max_retries
+        )
+        session = requests.Session()
+        session.headers['Accept-Encoding'] = GRAPH_ACCEPT_ENCODING
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
     def is_configured(self) -> bool:
         """Vérifie si le service Graph est configuré"""
         return Config.is_onedrive_enabled()
@@ -40,16 +112,20 @@ class GraphService:
         """
         Upload un fichier vers OneDrive
         """
-        if not self.is_configured():
-            return {
-                "success": False,
-                "error": "OneDrive non configuré"
-            }
-        if self.onedrive_upload_enabled is False:
-            return {
-                "success": True,
-                "info": "Upload OneDrive désactivé"
-            }
+        return self._upload([file_content], len(file_content), file_name, user_id)
+
+    def upload_stream_to_onedrive(self, chunks: Iterable[bytes], total_size: int,
+                                  file_name: str, user_id: str) -> Dict[str, Any]:
+        """
+        Upload un flux (ex: chunks d'un blob) vers OneDrive sans charger tout le fichier en mémoire
+        """
+        return self._upload(chunks, total_size, file_name, user_id)
+
+    def _upload(self, chunks: Iterable[bytes], total_size: int, file_name: str, user_id: str) -> Dict[str, Any]:
+        """Upload simple (≤ 4 Mo) ou par session d'upload selon la taille du fichier"""
+        unavailable = self._check_upload_available()
+        if unavailable:
+            return unavailable
         try:
             logger.info(f"☁️ Upload vers OneDrive: {file_name} pour {user_id}")
 
@@ -62,7 +138,7 @@ class GraphService:
                 }
 
             # Création du dossier si nécessaire
-            folder_id = self._ensure_folder_exists(access_token, self.onedrive_folder)
+            folder_id = self._ensure_folder_exists(self.onedrive_folder)
             if not folder_id:
                 return {
                     "success": False,
@@ -73,39 +149,29 @@ class GraphService:
             unique_filename = self._get_unique_filename(file_name, user_id)
 
             # Upload du fichier
-            upload_url = f"{self.graph_base_url}/me/drive/items/{folder_id}:/{unique_filename}:/content"
-            logger.info(f"📤 URL d'upload: {upload_url}")
-
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/octet-stream'
-            }
+            if total_size > SIMPLE_UPLOAD_MAX_BYTES:
+                response = self._upload_in_chunks(folder_id, unique_filename, chunks, total_size)
+                if response is None:
+                    return {
+                        "success": False,
+                        "error": "Fichier source incomplet : upload OneDrive annulé"
+                    }
+            else:
+                upload_url = f"{self._upload_prefix(folder_id)}/{unique_filename}:/content"
+                logger.info(f"📤 URL d'upload: {upload_url}")
 
-            response = requests.put(
-                upload_url,
-                headers=headers,
-                data=file_content,
-                timeout=60
-            )
+                response = self._session.put(
+                    upload_url,
+                    headers={'Content-Type': 'application/octet-stream'},
+                    data=b"".join(chunks),
+                    timeout=60
+                )
 
-            if response.status_code in [200, 201]:
-                file_info = response.json()
-                onedrive_url = file_info.get('webUrl')
+            if response.status_code == 404:
+                # Dossier supprimé entre-temps : l'identifiant en cache n'est plus valide
+                self._invalidate_folder_cache(folder_id)
 
-                logger.info(f"✅ Fichier uploadé vers OneDrive: {unique_filename}")
-                return {
-                    "success": True,
-                    "onedrive_url": onedrive_url,
-                    "file_id": file_info.get('id'),
-                    "file_name": unique_filename
-                }
-            else:
-                error_msg = f"Erreur HTTP {response.status_code}: {response.text}"
-                logger.error(f"❌ Erreur upload OneDrive: {error_msg}")
-                return {
-                    "success": False,
-                    "error": error_msg
-                }
+            return self._build_upload_result(response, unique_filename)
 
         except Exception as e:
             logger.error(f"❌ Erreur lors de l'upload OneDrive: {str(e)}")
@@ -114,84 +180,394 @@ class GraphService:
                 "error": f"Erreur interne: {str(e)}"
             }
 
-    def _get_access_token(self) -> Optional[str]:
-        """Obtient un token d'accès Microsoft Graph"""
-        try:
-            # Vérifier si le token en cache est encore valide
-            if self._access_token and self._token_expires_at:
-                import time
-                if time.time() < self._token_expires_at - 300:  # 5 min de marge
-                    return self._access_token
-
-            # Demande d'un nouveau token
-            data = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret,
-                'scope': 'https://graph.microsoft.com/.default',
-                'grant_type': 'client_credentials'
+    def _check_upload_available(self) -> Optional[Dict[str, Any]]:
+        """Retourne le résultat à renvoyer si l'upload OneDrive n'est pas possible, sinon None"""
+        if not self.is_configured():
+            return {
+                "success": False,
+                "error": "OneDrive non configuré"
+            }
+        if self.onedrive_upload_enabled is False:
+            return {
+                "success": True,
+                "info": "Upload OneDrive désactivé"
             }
+        return None
 
-            response = requests.post(self.token_url, data=data, timeout=30)
+    def _build_upload_result(self, response, unique_filename: str) -> Dict[str, Any]:
+        """Construit le résultat d'upload à partir de la réponse Graph"""
+        if response.status_code in [200, 201]:
+            file_info = orjson.loads(response.content)
+            onedrive_url = file_info.get('webUrl')
 
-            if response.status_code == 200:
-                token_data = response.json()
-                self._access_token = token_data.get('access_token')
-                expires_in = token_data.get('expires_in', 3600)
+            logger.info(f"✅ Fichier uploadé vers OneDrive: {unique_filename}")
+            return {
+                "success": True,
+                "onedrive_url": onedrive_url,
+                "file_id": file_info.get('id'),
+                "file_name": unique_filename
+            }
 
-                import time
-                self._token_expires_at = time.time() + expires_in
+        error_msg = f"Erreur HTTP {response.status_code}: {response.text}"
+        logger.error(f"❌ Erreur upload OneDrive: {error_msg}")
+        return {
+            "success": False,
+            "error": error_msg
+        }
+
+    def _upload_prefix(self, folder_id: str) -> str:
+        """Préfixe des URLs d'upload dans un dossier, construit une fois par identifiant"""
+        prefix = self._upload_prefixes.get(folder_id)
+        if prefix is None:
+            prefix = f"{self.graph_base_url}/me/drive/items/{folder_id}:"
+            self._upload_prefixes[folder_id] = prefix
+        return prefix
+
+    def _upload_session_url(self, folder_id: str, unique_filename: str) -> str:
+        """URL de création d'une session d'upload dans le dossier cible"""
+        return f"{self._upload_prefix(folder_id)}/{unique_filename}:/createUploadSession"
+
+    @staticmethod
+    def _upload_session_data() -> Dict[str, Any]:
+        """Corps de la requête createUploadSession"""
+        return {"item": {"@microsoft.graph.conflictBehavior": "rename"}}
+
+    @staticmethod
+    def _iter_upload_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Redécoupe un flux en morceaux de UPLOAD_CHUNK_SIZE (le dernier peut être plus court)"""
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= UPLOAD_CHUNK_SIZE:
+                yield bytes(buffer[:UPLOAD_CHUNK_SIZE])
+                del buffer[:UPLOAD_CHUNK_SIZE]
+        if buffer:
+            yield bytes(buffer)
+
+    @staticmethod
+    def _content_range_headers(offset: int, chunk: bytes, total_size: int) -> Dict[str, str]:
+        """Headers d'un morceau de session d'upload"""
+        return {
+            'Content-Length': str(len(chunk)),
+            'Content-Range': f"bytes {offset}-{offset + len(chunk) - 1}/{total_size}"
+        }
+
+    def _upload_in_chunks(self, folder_id: str, unique_filename: str,
+                          chunks: Iterable[bytes], total_size: int):
+        """
+        Upload par session Graph (createUploadSession) en morceaux de UPLOAD_CHUNK_SIZE.
+        Retourne la dernière réponse Graph (driveItem en cas de succès),
+        ou None si le flux source s'est terminé avant total_size octets.
+        """
+        logger.info(f"📤 Session d'upload pour {unique_filename} ({total_size} bytes)")
+
+        response = self._session.post(
+            self._upload_session_url(folder_id, unique_filename),
+            json=self._upload_session_data(),
+            timeout=30
+        )
+        if response.status_code != 200:
+            return response
+
+        # L'URL de session est pré-authentifiée : le header Authorization de la session est retiré
+        upload_url = orjson.loads(response.content).get('uploadUrl')
+        offset = 0
+        try:
+            for chunk in self._iter_upload_chunks(chunks):
+                response = self._session.put(
+                    upload_url,
+                    headers={**self._content_range_headers(offset, chunk, total_size), 'Authorization': None},
+                    data=chunk,
+                    timeout=60
+                )
+                if response.status_code not in [200, 201, 202]:
+                    self._cancel_upload_session(upload_url)
+                    return response
+                offset += len(chunk)
+        except Exception:
+            self._cancel_upload_session(upload_url)
+            raise
+
+        if offset != total_size:
+            logger.error(f"❌ Flux source incomplet: {offset}/{total_size} bytes envoyés")
+            self._cancel_upload_session(upload_url)
+            return None
+
+        return response
+
+    def _cancel_upload_session(self, upload_url: str) -> None:
+        """Annule une session d'upload interrompue (sinon conservée côté Graph jusqu'à expiration)"""
+        try:
+            self._session.delete(upload_url, headers={'Authorization': None}, timeout=30)
+            logger.warning("⚠️ Session d'upload OneDrive annulée")
+        except Exception as e:
+            logger.error(f"❌ Erreur annulation session d'upload: {str(e)}")
 
-                logger.info("✅ Token Microsoft Graph obtenu")
+    def _get_cached_token(self) -> Optional[str]:
+        """Retourne le token en cache s'il est encore valide"""
+        if self._access_token and self._token_expires_at:
+            if time.time() < self._token_expires_at - 300:  # 5 min de marge
                 return self._access_token
-            else:
-                logger.error(f"❌ Erreur obtention token: {response.status_code} - {response.text}")
-                return None
+        return None
+
+    def _token_request_data(self) -> Dict[str, str]:
+        """Corps de la requête client_credentials"""
+        return {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'scope': 'https://graph.microsoft.com/.default',
+            'grant_type': 'client_credentials'
+        }
+
+    def _store_token(self, token_data: Dict[str, Any]) -> Optional[str]:
+        """Met en cache le token obtenu et sa date d'expiration"""
+        self._access_token = token_data.get('access_token')
+        expires_in = token_data.get('expires_in', 3600)
+
+        # Header installé une fois sur les sessions, recalculé uniquement à la rotation du token
+        self._session.headers['Authorization'] = f'Bearer {self._access_token}'
+        self._no_retry_session.headers['Authorization'] = self._session.headers['Authorization']
+
+        self._token_expires_at = time.time() + expires_in
+
+        logger.info("✅ Token Microsoft Graph obtenu")
+        return self._access_token
+
+    def _get_cached_folder_id(self, folder_name: str) -> Optional[str]:
+        """Retourne l'identifiant du dossier en cache s'il n'a pas expiré"""
+        cached = self._folder_id_cache.get(folder_name)
+        if cached and time.time() < cached[1]:
+            return cached[0]
+        return None
+
+    def _cache_folder_id(self, folder_name: str, folder_id: Optional[str],
+                         etag: Optional[str] = None) -> Optional[str]:
+        """Met en cache l'identifiant d'un dossier (et son ETag) et le retourne"""
+        if folder_id:
+            self._folder_id_cache[folder_name] = (folder_id, time.time() + FOLDER_CACHE_TTL_SECONDS)
+            if etag:
+                self._folder_etags[folder_name] = etag
+        return folder_id
+
+    def _invalidate_folder_cache(self, folder_id: str) -> None:
+        """Retire du cache les dossiers correspondant à cet identifiant"""
+        self._upload_prefixes.pop(folder_id, None)
+        for name, (cached_id, _) in list(self._folder_id_cache.items()):
+            if cached_id == folder_id:
+                self._folder_id_cache.pop(name, None)
+                self._folder_etags.pop(name, None)
+
+    def _get_stale_folder(self, folder_name: str) -> Optional[Tuple[str, str]]:
+        """Retourne (id, ETag) d'un dossier dont l'entrée de cache a expiré, s'il est revalidable"""
+        cached = self._folder_id_cache.get(folder_name)
+        etag = self._folder_etags.get(folder_name)
+        if cached and etag:
+            return cached[0], etag
+        return None
+
+    def _folder_item_url(self, folder_id: str) -> str:
+        """URL d'un élément du drive par identifiant"""
+        return f"{self.graph_base_url}/me/drive/items/{folder_id}"
+
+    def _revalidated_folder_id(self, folder_name: str, folder_id: str, etag: str, response) -> Optional[str]:
+        """
+        Interprète la réponse du GET conditionnel : 304 = inchangé, pas de corps à parser
+        Tout autre statut retourne None sans toucher au cache
+        """
+        if response.status_code == 304:
+            logger.info(f"📁 Dossier inchangé (304): {folder_name}")
+            return self._cache_folder_id(folder_name, folder_id, etag)
+        if response.status_code == 200:
+            folder = orjson.loads(response.content)
+            return self._cache_folder_id(
+                folder_name,
+                self._folder_id_from_item(folder, folder_name),
+                response.headers.get('ETag') or folder.get('eTag')
+            )
+        return None
+
+    def _graph_batch_url(self) -> str:
+        """URL du endpoint JSON batching de Microsoft Graph"""
+        return f"{self.graph_base_url}/$batch"
+
+    @staticmethod
+    def _index_batch_responses(batch_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Indexe les réponses d'un $batch par id (l'ordre n'est pas garanti par Graph)"""
+        return {item.get('id'): item for item in batch_data.get('responses', [])}
+
+    def _folder_batch_requests(self, folder_name: str) -> List[Dict[str, Any]]:
+        """
+        Sous-requêtes de résolution/création d'un dossier, exécutées en parallèle par Graph :
+        1 = résolution par chemin, 2 = création (échoue en 409 si le dossier existe déjà)
+        """
+        return [
+            {
+                "id": "1",
+                "method": "GET",
+                "url": f"/me/drive/root:/{quote(folder_name)}"
+            },
+            {
+                "id": "2",
+                "method": "POST",
+                "url": "/me/drive/root/children",
+                "headers": {"Content-Type": "application/json"},
+                "body": self._folder_creation_data(folder_name, conflict_behavior="fail")
+            }
+        ]
+
+    def _folder_from_batch(self, responses: Dict[str, Dict[str, Any]], folder_name: str) -> Optional[Dict[str, Any]]:
+        """Extrait l'élément dossier des réponses du batch de résolution/création"""
+        resolved = responses.get("1", {})
+        if resolved.get('status') == 200:
+            folder = resolved.get('body') or {}
+            if self._folder_id_from_item(folder, folder_name):
+                return folder
+
+        # La création n'est retenue que si la résolution a confirmé l'absence du dossier (404)
+        created = responses.get("2", {})
+        if resolved.get('status') == 404 and created.get('status') in [200, 201]:
+            logger.info(f"✅ Dossier créé: {folder_name}")
+            return created.get('body') or {}
+
+        return None
+
+    @staticmethod
+    def _name_taken_by_file(responses: Dict[str, Dict[str, Any]]) -> bool:
+        """Vrai si le nom est occupé par un fichier : résolution 200 (non dossier) et création 409"""
+        resolved = responses.get("1", {})
+        created = responses.get("2", {})
+        return (
+            resolved.get('status') == 200
+            and (resolved.get('body') or {}).get('folder') is None
+            and created.get('status') == 409
+        )
+
+    @staticmethod
+    def _folder_id_from_item(item: Dict[str, Any], folder_name: str) -> Optional[str]:
+        """Retourne l'identifiant de l'élément s'il s'agit bien d'un dossier"""
+        if item.get('folder') is not None:
+            logger.info(f"📁 Dossier existant trouvé: {folder_name}")
+            return item.get('id')
+        return None
+
+    @staticmethod
+    def _folder_creation_data(folder_name: str, conflict_behavior: str = "rename") -> Dict[str, Any]:
+        """Corps de la requête de création de dossier"""
+        return {
+            "name": folder_name,
+            "folder": {},
+            "@microsoft.graph.conflictBehavior": conflict_behavior
+        }
+
+    def _graph_batch(self, requests_list: List[Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Envoie jusqu'à 20 requêtes Graph en un seul aller-retour (POST /$batch)
+        Retourne les réponses indexées par id, ou None si le batch échoue
+        """
+        try:
+            response = self._session.post(
+                self._graph_batch_url(),
+                headers={'Content-Type': 'application/json'},
+                data=orjson.dumps({"requests": requests_list}),
+                timeout=30
+            )
+
+            if response.status_code == 200:
+                return self._index_batch_responses(orjson.loads(response.content))
+
+            logger.error(f"❌ Erreur batch Graph: {response.status_code} - {response.text}")
+            return None
+
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du batch Graph: {str(e)}")
+            return None
+
+    def _get_access_token(self) -> Optional[str]:
+        """Obtient un token d'accès Microsoft Graph"""
+        try:
+            # Vérifier si le token en cache est encore valide (sans verrou)
+            cached_token = self._get_cached_token()
+            if cached_token:
+                return cached_token
+
+            with self._token_lock:
+                # Un autre thread a pu rafraîchir le token pendant l'attente du verrou
+                cached_token = self._get_cached_token()
+                if cached_token:
+                    return cached_token
+
+                # Demande d'un nouveau token
+                # Le header Authorization de la session (token Graph) ne concerne pas le endpoint AAD
+                response = self._session.post(
+                    self.token_url,
+                    data=self._token_request_data(),
+                    headers={'Authorization': None},
+                    timeout=30
+                )
+
+                if response.status_code == 200:
+                    return self._store_token(orjson.loads(response.content))
+                else:
+                    logger.error(f"❌ Erreur obtention token: {response.status_code} - {response.text}")
+                    return None
 
         except Exception as e:
             logger.error(f"❌ Erreur lors de l'obtention du token: {str(e)}")
             return None
 
-    def _ensure_folder_exists(self, access_token: str, folder_name: str) -> Optional[str]:
+    def _ensure_folder_exists(self, folder_name: str) -> Optional[str]:
         """S'assure que le dossier existe sur OneDrive"""
         try:
-            # Recherche du dossier existant
-            search_url = f"{self.graph_base_url}/me/drive/root/children"
-            headers = {'Authorization': f'Bearer {access_token}'}
+            cached_id = self._get_cached_folder_id(folder_name)
+            if cached_id:
+                return cached_id
+
+            # Entrée expirée : GET conditionnel (If-None-Match), 304 sans corps si inchangé
+            stale = self._get_stale_folder(folder_name)
+            if stale:
+                folder_id, etag = stale
+                response = self._session.get(
+                    self._folder_item_url(folder_id),
+                    headers={'If-None-Match': etag},
+                    timeout=30
+                )
+                if response.status_code == 404:
+                    # Dossier supprimé entre-temps : on oublie l'entrée et on le résout à nouveau
+                    self._invalidate_folder_cache(folder_id)
+                else:
+                    # 401, 429, 5xx... : pas de création de dossier sur une erreur transitoire
+                    return self._revalidated_folder_id(folder_name, folder_id, etag, response)
+
+            # Résolution et création éventuelle du dossier en un seul aller-retour
+            responses = self._graph_batch(self._folder_batch_requests(folder_name))
+            if not responses:
+                return None
 
-            response = requests.get(search_url, headers=headers, timeout=30)
+            folder = self._folder_from_batch(responses, folder_name)
+            if folder:
+                return self._cache_folder_id(folder_name, folder.get('id'), folder.get('eTag'))
 
-            if response.status_code == 200:
-                items = response.json().get('value', [])
-                for item in items:
-                    if (item.get('name') == folder_name and 
-                        item.get('folder') is not None):
-                        logger.info(f"📁 Dossier existant trouvé: {folder_name}")
-                        return item.get('id')
+            if not self._name_taken_by_file(responses):
+                logger.error(f"❌ Résolution du dossier impossible: {folder_name}")
+                return None
 
-            # Création du dossier s'il n'existe pas
+            # Repli : création avec renommage (un fichier porte déjà ce nom)
             create_url = f"{self.graph_base_url}/me/drive/root/children"
-            
-            folder_data = {
-                "name": folder_name,
-                "folder": {},
-                "@microsoft.graph.conflictBehavior": "rename"
-            }
+            folder_data = self._folder_creation_data(folder_name)
 
-            create_response = requests.post(
+            # POST non idempotent : envoyé sans retry pour qu'un 5xx ayant tout de même
+            # abouti ne soit pas rejoué en un second dossier renommé
+            create_response = self._no_retry_session.post(
                 create_url,
-                headers={
-                    'Authorization': f'Bearer {access_token}',
-                    'Content-Type': 'application/json'
-                },
                 json=folder_data,
                 timeout=30
             )
 
             if create_response.status_code in [200, 201]:
-                folder_info = create_response.json()
+                folder_info = orjson.loads(create_response.content)
                 folder_id = folder_info.get('id')
                 logger.info(f"✅ Dossier créé: {folder_name}")
-                return folder_id
+                return self._cache_folder_id(folder_name, folder_id, folder_info.get('eTag'))
             else:
                 logger.error(f"❌ Erreur création dossier: {create_response.status_code}")
                 return None
@@ -202,16 +578,20 @@ class GraphService:
 
     def _get_unique_filename(self, file_name: str, user_id: str) -> str:
         """Génère un nom de fichier unique pour OneDrive"""
-        from datetime import datetime
-        
         # Extraction nom et extension
         if '.' in file_name:
             name, ext = file_name.rsplit('.', 1)
         else:
             name, ext = file_name, ''
 
-        # Ajout timestamp et user_id
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Ajout date et user_id, suffixe en nanosecondes (hexa) pour l'unicité
+        now_ns = time.time_ns()
+        day, date_prefix = self._date_prefix
+        if day != now_ns // NS_PER_DAY:
+            date_prefix = time.strftime("%Y%m%d", time.gmtime(now_ns // 1_000_000_000))
+            self._date_prefix = (now_ns // NS_PER_DAY, date_prefix)
+
+        timestamp = f"{date_prefix}_{now_ns:x}"
         unique_name = f"{name}_{user_id}_{timestamp}"
         
         if ext:
@@ -237,7 +617,7 @@ class GraphService:
 
             # URL pour lister les fichiers
             if folder_name:
-                folder_id = self._ensure_folder_exists(access_token, folder_name)
+                folder_id = self._ensure_folder_exists(folder_name)
                 if not folder_id:
                     return {
                         "success": False,
@@ -247,11 +627,10 @@ class GraphService:
             else:
                 list_url = f"{self.graph_base_url}/me/drive/root/children"
 
-            headers = {'Authorization': f'Bearer {access_token}'}
-            response = requests.get(list_url, headers=headers, timeout=30)
+            response = self._session.get(list_url, timeout=30)
 
             if response.status_code == 200:
-                items = response.json().get('value', [])
+                items = orjson.loads(response.content).get('value', [])
                 files = []
                 
                 for item in items:
@@ -302,11 +681,10 @@ class GraphService:
                 }
 
             delete_url = f"{self.graph_base_url}/me/drive/items/{file_id}"
-            headers = {'Authorization': f'Bearer {access_token}'}
-
-            response = requests.delete(delete_url, headers=headers, timeout=30)
+            response = self._session.delete(delete_url, timeout=30)
 
             if response.status_code == 204:
+                self._invalidate_folder_cache(file_id)
                 logger.info(f"✅ Fichier OneDrive supprimé: {file_id}")
                 return {
                     "success": True,
@@ -324,4 +702,26 @@ class GraphService:
             return {
                 "success": False,
                 "error": f"Erreur interne: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+@functools.lru_cache(maxsize=1)
+def get_graph_service() -> GraphService:
+    """
+    Instance GraphService partagée par l'application : un seul verrou de token,
+    un seul cache de dossiers et une seule session HTTP par instance
+    """
+    return GraphService()
+
+
+def public_upload_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Résultat d'upload destiné au client : le détail d'erreur (exception, réponse Graph)
+    n'est exposé que si EXPOSE_ERROR_DETAILS est activé
+    """
+    if result.get("success") or Config.EXPOSE_ERROR_DETAILS:
+        return result
+    return {
+        "success": False,
+        "error": ONEDRIVE_UPLOAD_ERROR
+    }
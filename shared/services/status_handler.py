@@ -8,8 +8,9 @@ import time
 from typing import Dict, Any, Optional
 from shared.services.translation_service import TranslationService
 from shared.services.blob_service import BlobService
-from shared.services.graph_service import GraphService
+from shared.services.graph_service import ONEDRIVE_UPLOAD_ERROR, get_graph_service, public_upload_result
 from shared.models.schemas import TranslationStatus, TranslationResult
+from shared.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,7 @@ class StatusHandler:
     def __init__(self):
         self.translation_service = TranslationService()
         self.blob_service = BlobService()
-        self.graph_service = GraphService()
+        self.graph_service = get_graph_service()
         self.translation_id = None
         
         logger.info("✅ StatusHandler initialisé")
@@ -160,12 +161,14 @@ class StatusHandler:
         # Option 2: Upload vers OneDrive (si configuré)
         if self.graph_service.is_configured():
             try:
-                # Téléchargement du fichier depuis le blob
-                file_content = self.blob_service.download_translated_file(output_blob_name)
-                if file_content:
+                # Lecture en flux du fichier depuis le blob
+                blob_stream = self.blob_service.stream_translated_file(output_blob_name)
+                if blob_stream:
+                    chunks, total_size = blob_stream
                     # Upload vers OneDrive
-                    onedrive_result = self.graph_service.upload_to_onedrive(
-                        file_content=file_content,
+                    onedrive_result = self.graph_service.upload_stream_to_onedrive(
+                        chunks=chunks,
+                        total_size=total_size,
                         file_name=f"{translation_info.file_name}",
                         user_id=translation_info.user_id
                     )
@@ -175,13 +178,13 @@ class StatusHandler:
                         result["onedrive_file_id"] = onedrive_result.get("file_id")
                         logger.info("✅ Fichier uploadé vers OneDrive")
                     else:
-                        result["onedrive_error"] = onedrive_result["error"]
+                        result["onedrive_error"] = public_upload_result(onedrive_result)["error"]
                         logger.warning(f"⚠️ Erreur upload OneDrive: {onedrive_result['error']}")
                 else:
                     result["onedrive_error"] = "Fichier traduit inaccessible"
             except Exception as e:
-                result["onedrive_error"] = f"Erreur upload: {str(e)}"
-                logger.error(f"❌ Erreur upload OneDrive: {str(e)}")
+                result["onedrive_error"] = f"Erreur upload: {str(e)}" if Config.EXPOSE_ERROR_DETAILS else ONEDRIVE_UPLOAD_ERROR
+                logger.exception("❌ Erreur upload OneDrive")
 
         return result
 
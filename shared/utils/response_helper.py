@@ -2,36 +2,44 @@
 Helpers pour les réponses HTTP Azure Functions
 """
 
-import json
+import functools
 import logging
+import orjson
 from typing import Dict, Any, Optional
 import azure.functions as func
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Options orjson : même rendu que json.dumps(indent=2), clés non-str converties comme avec json
+JSON_DUMPS_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Headers communs à toutes les réponses JSON (CORS inclus), X-Timestamp ajouté par réponse
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json; charset=utf-8',
+    'X-Service': 'Azure-Functions-Translation',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With'
+}
+
+
+def _default_headers() -> Dict[str, str]:
+    """Copie des headers par défaut, horodatée"""
+    return {**DEFAULT_HEADERS, 'X-Timestamp': datetime.utcnow().isoformat() + 'Z'}
+
 
 def create_response(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> func.HttpResponse:
     """
     Crée une réponse HTTP standardisée pour Azure Functions
     """
     try:
-        # Headers par défaut
-        default_headers = {
-            'Content-Type': 'application/json; charset=utf-8',
-            'X-Timestamp': datetime.utcnow().isoformat() + 'Z',
-            'X-Service': 'Azure-Functions-Translation'
-        }
+        # Headers par défaut (CORS inclus), surchargeables par l'appelant
+        default_headers = _default_headers()
         
         if headers:
             default_headers.update(headers)
         
-        # Ajout des headers CORS si nécessaire
-        if 'Access-Control-Allow-Origin' not in default_headers:
-            default_headers['Access-Control-Allow-Origin'] = '*'
-            default_headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-            default_headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-        
         # Sérialisation des données
         if isinstance(data, dict):
             # Ajout des métadonnées de réponse
@@ -47,7 +55,7 @@ def create_response(data: Any, status_code: int = 200, headers: Optional[Dict[st
                 'result': data
             }
         
-        json_data = json.dumps(response_data, ensure_ascii=False, indent=2)
+        json_data = orjson.dumps(response_data, option=JSON_DUMPS_OPTIONS)
         
         return func.HttpResponse(
             body=json_data,
@@ -61,6 +69,49 @@ def create_response(data: Any, status_code: int = 200, headers: Optional[Dict[st
         return create_error_response("Erreur de sérialisation", 500)
 
 
+def create_prebuilt_response(data_json: bytes, status_code: int = 200) -> func.HttpResponse:
+    """
+    Crée une réponse standardisée à partir de données déjà sérialisées en JSON
+    Pour les payloads constants mis en cache : seule l'enveloppe est sérialisée par requête
+    """
+    return _create_enveloped_response(True, 'data', data_json, status_code)
+
+
+@functools.lru_cache(maxsize=32)
+def _serialized_error(message: str, status_code: int) -> bytes:
+    """Objet 'error' sérialisé, mis en cache par couple (message, code)"""
+    return orjson.dumps({'message': message, 'status_code': status_code}, option=JSON_DUMPS_OPTIONS)
+
+
+def create_cached_error_response(message: str, status_code: int = 500) -> func.HttpResponse:
+    """
+    Crée une réponse d'erreur standardisée pour un message constant
+    L'objet 'error' n'est sérialisé qu'une fois : utile quand le service est dégradé
+    """
+    return _create_enveloped_response(False, 'error', _serialized_error(message, status_code), status_code)
+
+
+def _create_enveloped_response(success: bool, key: str, payload_json: bytes,
+                               status_code: int) -> func.HttpResponse:
+    """
+    Sérialise l'enveloppe {success, timestamp, <key>} autour d'un JSON déjà sérialisé,
+    inséré tel quel (orjson.Fragment) sans être re-sérialisé
+    """
+    headers = _default_headers()
+    response_data = {
+        'success': success,
+        'timestamp': headers['X-Timestamp'],
+        key: orjson.Fragment(payload_json)
+    }
+
+    return func.HttpResponse(
+        body=orjson.dumps(response_data, option=JSON_DUMPS_OPTIONS),
+        status_code=status_code,
+        headers=headers,
+        mimetype='application/json'
+    )
+
+
 def create_error_response(message: str, status_code: int = 400, 
                          error_code: Optional[str] = None,
                          details: Optional[Dict[str, Any]] = None) -> func.HttpResponse:
@@ -84,16 +135,9 @@ def create_error_response(message: str, status_code: int = 400,
             error_data['error']['details'] = details
         
         # Headers avec CORS
-        headers = {
-            'Content-Type': 'application/json; charset=utf-8',
-            'X-Timestamp': datetime.utcnow().isoformat() + 'Z',
-            'X-Service': 'Azure-Functions-Translation',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With'
-        }
+        headers = _default_headers()
         
-        json_data = json.dumps(error_data, ensure_ascii=False, indent=2)
+        json_data = orjson.dumps(error_data, option=JSON_DUMPS_OPTIONS)
         
         return func.HttpResponse(
             body=json_data,